@@ -25,10 +25,17 @@ fi
 
 echo "[i] Собираю seed-agent (onefile)..."
 # Вызываем через модуль, чтобы не зависеть от PATH (~/.local/bin).
+# uvicorn выбирает event loop и HTTP-парсер по строке (loop="auto"/http="auto"),
+# статический анализ PyInstaller этого не видит — добавляем uvloop/httptools явно.
+# Если они не установлены, PyInstaller только предупредит, а бинарь
+# запустится на asyncio/h11.
 python3 -m PyInstaller \
   --clean \
   --onefile \
   --name seed-agent \
+  --collect-submodules uvicorn \
+  --hidden-import uvloop \
+  --hidden-import httptools \
   run_seed_agent.py
 
 echo
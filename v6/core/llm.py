@@ -1,11 +1,28 @@
 # -*- coding: utf-8 -*-
 import os, json, time, base64, uuid, requests
 from typing import Optional
+from requests.adapters import HTTPAdapter
+try:
+    import orjson  # быстрее json и не раздувает кириллицу в \uXXXX
+except ImportError:
+    orjson = None
 from core.config import CFG
 from core.log import get_logger
 
 log = get_logger("llm")
 
+# Общая сессия для OAuth и chat/completions: keep-alive до GigaChat вместо
+# нового TCP/TLS рукопожатия на каждый запрос (GigaChat() создаётся на каждый алерт)
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=2, pool_maxsize=8, max_retries=0)
+_session.mount("https://", _adapter)
+_session.mount("http://", _adapter)
+
+def _dumps(payload: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
 class GigaChat:
     def __init__(self):
         self.client_id = CFG.gc_client_id
@@ -23,7 +40,8 @@ class GigaChat:
                 obj = json.load(f)
             if obj.get("expires_at", 0) > int(time.time() * 1000) + 5000:
                 return obj.get("access_token")
-        except Exception:
+        except (OSError, ValueError, TypeError, AttributeError):
+            # нет файла, битый JSON или не тот формат — просто получим токен заново
             pass
         return None
 
@@ -32,7 +50,7 @@ class GigaChat:
             os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
             with open(self.cache_path, "w", encoding="utf-8") as f:
                 json.dump({"access_token": token, "expires_at": expires_at}, f)
-        except Exception:
+        except OSError:
             pass
 
     def _get_token(self) -> str:
@@ -52,7 +70,7 @@ class GigaChat:
             "RqUID": str(uuid.uuid4()),
         }
         data = {"scope": self.scope}
-        r = requests.post(self.oauth_url, headers=headers, data=data, timeout=15, verify=self.verify_ssl)
+        r = _session.post(self.oauth_url, headers=headers, data=data, timeout=15, verify=self.verify_ssl)
         r.raise_for_status()
         obj = r.json()
         token = obj["access_token"]
@@ -76,16 +94,17 @@ class GigaChat:
             "max_tokens": max_tokens,
             "temperature": 0.2,
         }
-        r = requests.post(CFG.gc_api_url, json=payload, headers=headers, timeout=30, verify=self.verify_ssl)
+        body = _dumps(payload)  # сериализуем один раз — пригодится и для повтора после 401
+        r = _session.post(CFG.gc_api_url, data=body, headers=headers, timeout=30, verify=self.verify_ssl)
         if r.status_code == 401:
             # refresh token and retry
             token = self._get_token()  # will refresh
             headers["Authorization"] = f"Bearer {token}"
-            r = requests.post(CFG.gc_api_url, json=payload, headers=headers, timeout=30, verify=self.verify_ssl)
+            r = _session.post(CFG.gc_api_url, data=body, headers=headers, timeout=30, verify=self.verify_ssl)
 
         r.raise_for_status()
         j = r.json()
         try:
             return j["choices"][0]["message"]["content"]
-        except Exception:
+        except (KeyError, IndexError, TypeError):
             return ""
\ No newline at end of file
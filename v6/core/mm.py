@@ -1,11 +1,33 @@
 # -*- coding: utf-8 -*-
-import json, requests
+import os, json, requests
 from typing import Optional
+from requests.adapters import HTTPAdapter
+try:
+    import orjson  # быстрее json и не раздувает кириллицу в \uXXXX
+except ImportError:
+    orjson = None
 from core.config import CFG
 from core.log import get_logger
 
 log = get_logger("mm")
 
+def _debug() -> bool:
+    """Те же правила, что и в seed-agent: SEED_DEBUG=1 включает логи на каждое сообщение."""
+    return os.getenv("SEED_DEBUG", "0") in ("1", "true", "True")
+
+# Одна сессия на процесс: keep-alive до вебхука вместо нового TCP/TLS
+# соединения на каждое сообщение. Повторы не делаем — сообщение не должно
+# задублироваться в канале.
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0)
+_session.mount("https://", _adapter)
+_session.mount("http://", _adapter)
+
+def _dumps(payload: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
 def post_to_mm(text: str, color: Optional[str] = None) -> bool:
     """
     Отправляет сообщение в Mattermost.
@@ -28,14 +50,16 @@ def post_to_mm(text: str, color: Optional[str] = None) -> bool:
         else:
             payload = {"text": text}
 
-        r = requests.post(
+        r = _session.post(
             CFG.mm_webhook,
-            json=payload,
+            data=_dumps(payload),
+            headers={"Content-Type": "application/json"},
             timeout=10,
             verify=CFG.mm_verify_ssl,
         )
         if r.status_code // 100 == 2:
-            log.info("[MM] OK")
+            if _debug():
+                log.info("[MM] OK")
             return True
 
         log.warning("[MM] ERR %s: %s", r.status_code, r.text[:200])
@@ -10,6 +10,44 @@ def _pct(x):
 def _num(x):
     return f"{x:.2f}" if isinstance(x, (int, float)) else "n/a"
 
+# Final Fantasy стиль эмодзи для дисков
+def _disk_emoji(usage):
+    if not isinstance(usage, (int, float)):
+        return "⚙️"  # Механизм - неизвестно
+    if usage >= 90:
+        return "💎🔥"  # Красный кристалл с огнем - критично
+    elif usage >= 80:
+        return "⚔️"  # Меч - опасно
+    elif usage >= 60:
+        return "🛡️"  # Щит - осторожно
+    else:
+        return "✨"  # Звездочка - все хорошо
+
+# Final Fantasy стиль эмодзи для разных метрик
+def _cpu_emoji(usage):
+    if not isinstance(usage, (int, float)):
+        return "🔮"  # Кристальная сфера - неизвестно
+    if usage >= 90:
+        return "💎🔥"  # Красный кристалл с огнем - критично
+    elif usage >= 70:
+        return "🗡️"  # Острый меч - высокая нагрузка
+    elif usage >= 50:
+        return "⚔️"  # Скрещенные мечи - средняя нагрузка
+    else:
+        return "✨"  # Звездочка - низкая нагрузка
+
+def _mem_emoji(usage):
+    if not isinstance(usage, (int, float)):
+        return "🧙‍♂️"  # Маг - неизвестно
+    if usage >= 90:
+        return "💎🔥"  # Красный кристалл с огнем - критично
+    elif usage >= 70:
+        return "🏰"  # Замок - высокое использование
+    elif usage >= 50:
+        return "🛡️"  # Щит - среднее использование  
+    else:
+        return "🌟"  # Звезда - низкое использование
+
 def enrich_alert(alert: dict) -> dict:
     """
     Возвращает { 'cpu_now':.., 'mem_now':.., 'disk_used_now':.., ... }
@@ -20,7 +58,7 @@ def enrich_alert(alert: dict) -> dict:
     mount  = labels.get("mountpoint") or labels.get("path")
     
     # Используем только hostname без порта для метрик
-    inst_with_port = inst.split(":")[0] if inst else None
+    inst_with_port = inst.partition(":")[0] if inst else None
     end    = time.time()
     start  = end - LOOKBACK
 
@@ -97,8 +135,11 @@ def enrich_alert(alert: dict) -> dict:
         except Exception:
             pass
 
+    # Имя алерта приводим к нижнему регистру один раз для всех проверок ниже
+    alertname_l = labels.get("alertname", "").lower()
+
     # Пример для Mongo COLLSCAN (если метрика есть в Prom — от Telegraf/экспортеров)
-    if labels.get("alertname","").lower().startswith("mongohot"):
+    if alertname_l.startswith("mongohot"):
         # адаптируй expr под свою метрику (пример ниже — иллюстрация)
         expr = f'sum(increase(mongodb_op_collsacn_total{{instance="{inst_with_port}"}}[15m]))'
         try:
@@ -107,51 +148,13 @@ def enrich_alert(alert: dict) -> dict:
             pass
 
     # Пример для Postgres slow queries (тоже под свою метрику/экспортер)
-    if labels.get("alertname","").lower().startswith("pgslow"):
+    if alertname_l.startswith("pgslow"):
         expr = f'sum(increase(pg_stat_statements_calls_slow_total{{instance="{inst_with_port}"}}[15m]))'
         try:
             enr["pg_slow_15m"] = last_value(query(expr))
         except Exception:
             pass
 
-    # Final Fantasy стиль эмодзи для дисков
-    def _disk_emoji(usage):
-        if not isinstance(usage, (int, float)):
-            return "⚙️"  # Механизм - неизвестно
-        if usage >= 90:
-            return "💎🔥"  # Красный кристалл с огнем - критично
-        elif usage >= 80:
-            return "⚔️"  # Меч - опасно
-        elif usage >= 60:
-            return "🛡️"  # Щит - осторожно
-        else:
-            return "✨"  # Звездочка - все хорошо
-    
-    # Final Fantasy стиль эмодзи для разных метрик
-    def _cpu_emoji(usage):
-        if not isinstance(usage, (int, float)):
-            return "🔮"  # Кристальная сфера - неизвестно
-        if usage >= 90:
-            return "💎🔥"  # Красный кристалл с огнем - критично
-        elif usage >= 70:
-            return "🗡️"  # Острый меч - высокая нагрузка
-        elif usage >= 50:
-            return "⚔️"  # Скрещенные мечи - средняя нагрузка
-        else:
-            return "✨"  # Звездочка - низкая нагрузка
-            
-    def _mem_emoji(usage):
-        if not isinstance(usage, (int, float)):
-            return "🧙‍♂️"  # Маг - неизвестно
-        if usage >= 90:
-            return "💎🔥"  # Красный кристалл с огнем - критично
-        elif usage >= 70:
-            return "🏰"  # Замок - высокое использование
-        elif usage >= 50:
-            return "🛡️"  # Щит - среднее использование  
-        else:
-            return "🌟"  # Звезда - низкое использование
-
     # Удобные строковые краткие подписи (на карточку)
     summary = []
     if "cpu_now" in enr:  
@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-import requests, re
+import requests
 from typing import Dict, Optional
 from core.config import CFG
 
@@ -6,10 +6,9 @@ Handles fetching alerts from Alertmanager and processing them
 """
 
 import requests
-import json
 import time
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
@@ -154,6 +153,8 @@ class AlertmanagerClient:
     def convert_to_seed_format(self, alerts: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Convert Alertmanager alerts to SEED Agent format"""
         seed_alerts = []
+        # Метка времени по умолчанию одна на весь батч: default у .get() вычисляется всегда
+        now_iso = datetime.utcnow().isoformat() + 'Z'
         
         for alert in alerts:
             labels = alert.get('labels', {})
@@ -182,7 +183,7 @@ class AlertmanagerClient:
                     'source': 'alertmanager'
                 },
                 'status': seed_status,
-                'startsAt': alert.get('startsAt', datetime.utcnow().isoformat() + 'Z'),
+                'startsAt': alert.get('startsAt', now_iso),
                 'endsAt': alert.get('endsAt', ''),
                 'generatorURL': alert.get('generatorURL', ''),
                 'fingerprint': alert.get('fingerprint', '')
@@ -8,12 +8,21 @@ import importlib.util
 from typing import Dict, List, Optional, Any
 import traceback
 
+
+def _debug() -> bool:
+    """Те же правила, что и в seed-agent: SEED_DEBUG=1 включает логи на каждый алерт."""
+    return os.getenv("SEED_DEBUG", "0") in ("1", "true", "True")
+
+
 class PluginRouter:
     def __init__(self):
         self.routes = []
         self.default_plugin = "echo"
         self.default_params = {}
         self.plugins_cache = {}
+        self._routes_by_name = {}  # alertname → маршруты-кандидаты в исходном порядке
+        self._routes_generic = []  # маршруты без условия на alertname
+        self._available_cache = None  # (mtime каталога plugins/, список имён)
         self.load_config()
     
     def load_config(self):
@@ -28,15 +37,58 @@ class PluginRouter:
             with open(config_path, 'r', encoding='utf-8') as f:
                 config = yaml.safe_load(f)
             
-            self.routes = config.get('routes', [])
-            self.default_plugin = config.get('default_plugin', 'echo')
-            self.default_params = config.get('default_params', {})
+            # Всё собираем в локальные переменные: если маршрут битый,
+            # остаётся прежний конфиг целиком, а не смесь старого и нового
+            routes = config.get('routes', [])
+            default_plugin = config.get('default_plugin', 'echo')
+            default_params = config.get('default_params', {})
+            compiled = self._compile_routes(routes, default_plugin)
+            by_name, generic = self._index_routes(compiled)
+
+            self.routes = routes
+            self.default_plugin = default_plugin
+            self.default_params = default_params
+            self._routes_by_name = by_name
+            self._routes_generic = generic
             
             print(f"[PLUGIN] Loaded {len(self.routes)} routes, default: {self.default_plugin}")
             
         except Exception as e:
             print(f"[PLUGIN] Error loading config: {e}")
     
+    def _compile_routes(self, routes: List[Dict[str, Any]], default_plugin: str) -> List[tuple]:
+        """
+        Готовит таблицу маршрутов один раз при загрузке конфига:
+        (условия match в виде кортежа пар, plugin_name, params)
+        """
+        compiled = []
+        for route in routes:
+            match_rules = tuple((route.get("match") or {}).items())
+            plugin_name = route.get("plugin", default_plugin)
+            params = route.get("params", {})
+            compiled.append((match_rules, plugin_name, params))
+        return compiled
+
+    def _index_routes(self, compiled: List[tuple]) -> tuple:
+        """
+        Индекс по alertname, чтобы не проверять все маршруты подряд.
+        Возвращает (по_имени, общие): для каждого alertname из match —
+        маршруты с этим именем плюс маршруты без условия на alertname,
+        в исходном порядке (первый подошедший по-прежнему выигрывает);
+        общие — только маршруты без условия на alertname.
+        """
+        def route_name(route):
+            name = dict(route[0]).get("alertname")
+            return name if isinstance(name, str) else None
+
+        by_name: Dict[str, List[tuple]] = {}
+        for route in compiled:
+            name = route_name(route)
+            if name is not None and name not in by_name:
+                by_name[name] = [r for r in compiled if route_name(r) in (None, name)]
+        generic = [r for r in compiled if route_name(r) is None]
+        return by_name, generic
+
     def match_alert(self, alert: Dict[str, Any]) -> tuple:
         """
         Находит подходящий плагин для алерта
@@ -44,27 +96,20 @@ class PluginRouter:
         """
         labels = alert.get("labels", {})
         
-        # Проверяем каждый маршрут
-        for route in self.routes:
-            match_rules = route.get("match", {})
-            
-            # Проверяем все условия в match
-            all_match = True
-            for key, expected_value in match_rules.items():
-                actual_value = labels.get(key)
-                
-                if actual_value != expected_value:
-                    all_match = False
-                    break
-            
-            if all_match:
-                plugin_name = route.get("plugin", self.default_plugin)
-                params = route.get("params", {})
-                print(f"[PLUGIN] Alert '{labels.get('alertname', 'Unknown')}' → {plugin_name}")
+        # Проверяем маршруты-кандидаты: все условия в match должны совпасть
+        alertname = labels.get("alertname")
+        candidates = self._routes_generic
+        if isinstance(alertname, str):
+            candidates = self._routes_by_name.get(alertname, candidates)
+        for match_rules, plugin_name, params in candidates:
+            if all(labels.get(key) == expected for key, expected in match_rules):
+                if _debug():
+                    print(f"[PLUGIN] Alert '{labels.get('alertname', 'Unknown')}' → {plugin_name}")
                 return plugin_name, params
         
         # Если ничего не подошло - используем default
-        print(f"[PLUGIN] Alert '{labels.get('alertname', 'Unknown')}' → {self.default_plugin} (default)")
+        if _debug():
+            print(f"[PLUGIN] Alert '{labels.get('alertname', 'Unknown')}' → {self.default_plugin} (default)")
         return self.default_plugin, self.default_params
     
     def load_plugin(self, plugin_name: str):
@@ -122,7 +167,8 @@ class PluginRouter:
             result = plugin_module.run(alert, prom_client, params)
             
             if result and isinstance(result, dict):
-                print(f"[PLUGIN] Success: {plugin_name} returned {len(result.get('lines', []))} lines")
+                if _debug():
+                    print(f"[PLUGIN] Success: {plugin_name} returned {len(result.get('lines', []))} lines")
                 return result
             else:
                 print(f"[PLUGIN] Warning: {plugin_name} returned invalid result")
@@ -139,12 +185,24 @@ class PluginRouter:
             "routes_count": len(self.routes),
             "default_plugin": self.default_plugin,
             "loaded_plugins": list(self.plugins_cache.keys()),
-            "available_plugins": [
-                f.replace('.py', '') 
-                for f in os.listdir(os.path.join(os.path.dirname(__file__), "plugins"))
+            "available_plugins": self._available_plugins(),
+        }
+
+    def _available_plugins(self) -> List[str]:
+        """
+        Имена плагинов в plugins/. /health дёргается часто, поэтому listdir
+        повторяем только когда меняется mtime каталога (файл добавили/удалили).
+        """
+        plugins_dir = os.path.join(os.path.dirname(__file__), "plugins")
+        mtime = os.stat(plugins_dir).st_mtime_ns
+        if self._available_cache is None or self._available_cache[0] != mtime:
+            names = [
+                f[:-3]
+                for f in os.listdir(plugins_dir)
                 if f.endswith('.py') and f != '__init__.py'
             ]
-        }
+            self._available_cache = (mtime, names)
+        return list(self._available_cache[1])
 
 
 # Создаем глобальный экземпляр роутера
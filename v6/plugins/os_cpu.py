@@ -9,6 +9,12 @@ Plugin: os_cpu
 """
 from typing import Any, Dict
 
+# PromHelper импортируем один раз при загрузке плагина, а не на каждый алерт
+try:
+    from prom_helpers import PromHelper
+except ImportError:
+    PromHelper = None
+
 # ── Схема параметров (читается admin-панелью) ────────────────────────────────
 PARAMS_SCHEMA = {
     "title": "CPU плагин",
@@ -72,12 +78,11 @@ def run(alert: Dict[str, Any], prom, params: Dict[str, Any]) -> Dict[str, Any]:
         return {"title": f"🔥 {alertname} @ {instance}", "lines": out}
 
     # ── PromHelper с авто-разрешением instance ────────────────
-    try:
-        from prom_helpers import PromHelper
+    if PromHelper is not None:
         h = PromHelper(instance)
         if h.instance != instance:
             out.append(f"🔍 Resolved: {instance} → {h.instance}")
-    except ImportError:
+    else:
         h = _FallbackHelper(instance, prom)
 
     out.append("")  # разделитель
@@ -4,6 +4,12 @@ Plugin: os_memory
 """
 from typing import Any, Dict
 
+# PromHelper импортируем один раз при загрузке плагина, а не на каждый алерт
+try:
+    from prom_helpers import PromHelper
+except ImportError:
+    PromHelper = None
+
 # ── Схема параметров (читается admin-панелью) ────────────────────────────────
 PARAMS_SCHEMA = {
     "title": "Memory плагин",
@@ -59,12 +65,11 @@ def run(alert: Dict[str, Any], prom, params: Dict[str, Any]) -> Dict[str, Any]:
     if not prom:
         return {"title": f"🧠 {alertname} @ {instance}", "lines": out}
 
-    try:
-        from prom_helpers import PromHelper
+    if PromHelper is not None:
         h = PromHelper(instance)
         if h.instance != instance:
             out.append(f"🔍 Resolved: {instance} → {h.instance}")
-    except ImportError:
+    else:
         h = _FallbackHelper(instance, prom)
 
     out.append("")
@@ -7,7 +7,7 @@ PromHelper — умная обёртка над prom.py.
 PromHelper сам найдёт правильный вариант через запрос `up`.
 """
 import prom as _prom
-from typing import Any, Dict, List, Optional
+from typing import Dict, List, Optional
 
 
 class PromHelper:
@@ -24,20 +24,22 @@ class PromHelper:
     # ─── Разрешение instance ──────────────────────────────────
     def _resolve(self, host: str) -> str:
         """Пробует найти правильный instance в Prometheus."""
-        # 1. Точное совпадение
-        if _prom.query(f'up{{instance="{host}"}}'):
+        bare, _, port = host.partition(":")
+
+        # Нестандартный instance (порт не числом) регуляркой ниже не ловится —
+        # для него сначала отдельное точное совпадение, как раньше
+        if port and not port.isdigit() and _prom.query(f'up{{instance="{host}"}}'):
             return host
 
-        # 2. host без порта → ищем host:*
-        bare = host.split(":")[0]
+        # Один запрос вместо двух: host и все host:<port> сразу
         results = _prom.query(f'up{{instance=~"{bare}(:[0-9]+)?$"}}')
         if results:
             candidates = [r["metric"].get("instance", host) for r in results]
-            # Предпочитаем :9100 (node_exporter)
-            for c in candidates:
-                if c.endswith(":9100"):
-                    return c
-            return candidates[0]
+            # 1. Точное совпадение
+            if host in candidates:
+                return host
+            # 2. Предпочитаем :9100 (node_exporter), иначе первый найденный
+            return next((c for c in candidates if c.endswith(":9100")), candidates[0])
 
         return host  # fallback — оставляем как есть
 
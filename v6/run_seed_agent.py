@@ -26,6 +26,9 @@ def main() -> None:
         port=port,
         log_level="info",
         reload=False,
+        # uvloop и httptools (requirements.txt) подхватываются, если установлены
+        loop="auto",
+        http="auto",
     )
 
 
@@ -11,11 +11,16 @@ SEED v6 – лёгкий HTTP агент:
 Логи пишем в stdout — start.sh уже перенаправляет их в logs/agent.log.
 """
 
-import os, json, time, threading, signal, sys
+import os, json, re, time, asyncio, threading, signal, sys, traceback
+import importlib.util
+from functools import lru_cache
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Optional
 
 import yaml
 from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse, HTMLResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 
@@ -48,6 +53,21 @@ except Exception:
     PROM_CLIENT_AVAILABLE = False
     prom = None
 
+# Готовность плагинов для пайплайна алертов: импорты не меняются после старта,
+# поэтому считаем один раз, а не на каждый алерт
+PLUGINS_READY = bool(PLUGINS_AVAILABLE and plugin_router and PROM_CLIENT_AVAILABLE and prom)
+
+# Быстрый разбор и сериализация JSON через orjson (опционально)
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse
+    DEFAULT_RESPONSE_CLASS = ORJSONResponse
+    _json_loads = orjson.loads   # принимает bytes напрямую, без .decode()
+except ImportError:
+    orjson = None
+    DEFAULT_RESPONSE_CLASS = JSONResponse
+    _json_loads = json.loads
+
 # ---------------------------
 # Загрузка ENV из configs/seed.env
 # ---------------------------
@@ -85,15 +105,60 @@ RABBIT_QUEUE = CFG.rabbit_queue
 # Все функции читают значения через эти геттеры, а не через глобальные переменные,
 # чтобы изменения в seed.env применялись сразу (без перезапуска агента).
 
+# (ключ, значение), о которых уже предупредили: геттеры вызываются на каждый пакет
+_env_int_warned: set = set()
+
+def _env_int(name: str, default: int) -> int:
+    """
+    Целое из env. Значение правится через PUT /admin/env, поэтому мусор
+    (например 0.5 или 5m) даёт значение по умолчанию, а не исключение.
+    """
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        if (name, raw) not in _env_int_warned:
+            _env_int_warned.add((name, raw))
+            print(f"[CONFIG] {name}={raw!r} is not an integer, using {default}")
+        return default
+
 def _use_llm() -> bool:
     return os.getenv("USE_LLM", "0") in ("1", "true", "True")
 
+def _llm_followup() -> bool:
+    return os.getenv("LLM_FOLLOWUP", "0") in ("1", "true", "True")
+
+def _llm_min_severity() -> Optional[int]:
+    """
+    Ранг минимальной severity, ради которой ходим в LLM (LLM_MIN_SEVERITY, например warning).
+    Пусто или неизвестное значение — ограничения нет, как раньше.
+    """
+    return _SEVERITY_RANK.get(os.getenv("LLM_MIN_SEVERITY", "").strip().lower())
+
+def _llm_cache_ttl() -> int:
+    """
+    Сколько секунд переиспользуем рекомендацию LLM для тех же групп алертов.
+    По умолчанию 0 — кэш выключен: ключ не учитывает метрики из промпта,
+    поэтому держать его стоит недолго (не дольше окна throttling).
+    """
+    return _env_int("LLM_CACHE_TTL_SEC", 0)
+
+def _debug() -> bool:
+    """Подробные логи на каждый алерт/запрос к LLM (по умолчанию выключены)."""
+    return os.getenv("SEED_DEBUG", "0") in ("1", "true", "True")
+
 def _dry_run() -> bool:
     return os.getenv("DRY_RUN", "0") in ("1", "true", "True")
 
 def _mm_webhook() -> str:
     return os.getenv("MM_WEBHOOK", "")
 
+def _delivery_enabled() -> bool:
+    """Есть ли куда отправлять: вебхук Mattermost или DRY_RUN-превью."""
+    return _dry_run() or bool(_mm_webhook())
+
 def _prom_url() -> str:
     return os.getenv("PROM_URL", "")
 
@@ -116,74 +181,129 @@ PROM_BEARER     = os.getenv("PROM_BEARER", "")
 # все они заменены на вызовы геттеров.
 PROM_URL = _prom_url()   # используется только в проверке ENRICHMENT
 
+# Регулярки для clean_llm_response компилируются один раз при импорте
+_RE_LANG_WORDS = re.compile(r'\b(sql|bash|plpgsql)\b', re.IGNORECASE)
+_RE_SPACES = re.compile(r'\s+')
+_RE_SECTION_INLINE = re.compile(r'([.!?])\s*(Диагностика|Рекомендации|Шаги\s+(?:для\s+)?решения):\s*', re.IGNORECASE)
+_RE_SECTION_START = re.compile(r'^(Диагностика|Рекомендации|Шаги\s+(?:для\s+)?решения):\s*', re.IGNORECASE)
+_RE_NUM_AFTER_SENTENCE = re.compile(r'([.!?]\s+)(\d+\.)\s+')
+_RE_NUM_AFTER_DOT = re.compile(r'(\.\s+)(\d+\.)\s+')
+_RE_NUM_LINE_START = re.compile(r'(^|\n)\s*(\d+\.)\s+', re.MULTILINE)
+_RE_BULLET_NUM = re.compile(r'•\s*\d+\.\s*')
+_RE_STEPS_GLUED = re.compile(r'([а-я])\.\s+(Шаги\s+(?:для\s+)?решения|Рекомендации):', re.IGNORECASE)
+_RE_SUBITEM = re.compile(r'([.!?])\s*([А-Я][а-я\s]+[а-я]):\s*([А-Я])')
+_RE_PARAGRAPH = re.compile(r'([а-я])\.\s+([А-Я][а-я]+[а-я]\s+[а-я]+)')
+_RE_LONG_LINE_SPLIT = re.compile(r'([,;])\s*(?=[А-Я])')
+
+# Строки, которые после разметки остались без содержимого
+_EMPTY_MARKERS = frozenset(('•', '**:**'))
+
+def _strip_code_blocks(text: str) -> str:
+    """Вырезает блоки кода ``` через str.find вместо ленивых DOTALL-регулярок.
+
+    Результат тот же, что у прежних замен (сначала блоки с языком, затем
+    любые пары оград), но незакрытая ограда больше не даёт квадратичного перебора.
+    """
+    # Блоки с указанием языка: ```lang\n ... \n```
+    out = []
+    pos = 0
+    n = len(text)
+    p = text.find('```')
+    while p != -1:
+        q = p + 3
+        while q < n and (text[q].isalnum() or text[q] == '_'):
+            q += 1
+        if q < n and text[q] == '\n':
+            end = text.find('\n```', q + 1)
+            if end == -1:
+                break  # закрывающей ограды нет — дальше совпадений тоже не будет
+            out.append(text[pos:p])
+            pos = end + 4
+            p = text.find('```', pos)
+        else:
+            p = text.find('```', p + 1)
+    out.append(text[pos:])
+    text = ''.join(out)
+
+    # Оставшиеся пары ``` ... ```
+    out = []
+    pos = 0
+    p = text.find('```')
+    while p != -1:
+        end = text.find('```', p + 3)
+        if end == -1:
+            break
+        out.append(text[pos:p])
+        pos = end + 3
+        p = text.find('```', pos)
+    out.append(text[pos:])
+    return ''.join(out)
+
 def clean_llm_response(text: str) -> str:
     """Очищает LLM ответ от блоков кода и форматирует для Mattermost"""
-    import re
-    
     # Убираем блоки кода ```sql, ```bash и т.д.
-    text = re.sub(r'```\w*\n.*?\n```', '', text, flags=re.DOTALL)
-    text = re.sub(r'```.*?```', '', text, flags=re.DOTALL)
+    # Дешёвая проверка подстроки: разбор оград запускаем, только если они есть
+    if '```' in text:
+        text = _strip_code_blocks(text)
     
     # Убираем лишние ключевые слова
-    text = re.sub(r'\b(sql|bash|plpgsql)\b', '', text, flags=re.IGNORECASE)
+    text = _RE_LANG_WORDS.sub('', text)
     
     # Нормализуем пробелы (но сохраняем структуру предложений)
-    text = re.sub(r'\s+', ' ', text)
+    text = _RE_SPACES.sub(' ', text)
     text = text.strip()
     
     # Первично обрабатываем ключевые фразы и разделители
     # Находим секции "Диагностика:" и "Шаги решения:" или "Рекомендации:"
-    text = re.sub(r'([.!?])\s*(Диагностика|Рекомендации|Шаги\s+(?:для\s+)?решения):\s*', r'\1\n\n**\2:**\n\n• ', text, flags=re.IGNORECASE)
-    text = re.sub(r'^(Диагностика|Рекомендации|Шаги\s+(?:для\s+)?решения):\s*', r'**\1:**\n\n• ', text, flags=re.IGNORECASE)
+    text = _RE_SECTION_INLINE.sub(r'\1\n\n**\2:**\n\n• ', text)
+    text = _RE_SECTION_START.sub(r'**\1:**\n\n• ', text)
     
     # Обрабатываем нумерацию внутри текста 
     # "1. Проверьте" -> "• Проверьте"
-    text = re.sub(r'([.!?]\s+)(\d+\.)\s+', r'\1\n• ', text)
-    text = re.sub(r'(\.\s+)(\d+\.)\s+', r'.\n• ', text)
-    text = re.sub(r'(^|\n)\s*(\d+\.)\s+', r'\1• ', text, flags=re.MULTILINE)
+    text = _RE_NUM_AFTER_SENTENCE.sub(r'\1\n• ', text)
+    text = _RE_NUM_AFTER_DOT.sub(r'.\n• ', text)
+    text = _RE_NUM_LINE_START.sub(r'\1• ', text)
     
     # Убираем лишние нумерации в начале пунктов после обработки
-    text = re.sub(r'•\s*\d+\.\s*', '• ', text)
+    text = _RE_BULLET_NUM.sub('• ', text)
     
     # Разделяем предложения, которые слиплись
     # "память. Шаги решения:" -> "память.\n\n**Шаги решения:**"
-    text = re.sub(r'([а-я])\.\s+(Шаги\s+(?:для\s+)?решения|Рекомендации):', r'\1.\n\n**\2:**\n\n• ', text, flags=re.IGNORECASE)
+    text = _RE_STEPS_GLUED.sub(r'\1.\n\n**\2:**\n\n• ', text)
     
     # Обрабатываем подпункты с двоеточием
-    text = re.sub(r'([.!?])\s*([А-Я][а-я\s]+[а-я]):\s*([А-Я])', r'\1\n\n• **\2:**\n  \3', text)
+    text = _RE_SUBITEM.sub(r'\1\n\n• **\2:**\n  \3', text)
     
     # Разделяем длинные абзацы по логическим границам
-    text = re.sub(r'([а-я])\.\s+([А-Я][а-я]+[а-я]\s+[а-я]+)', r'\1.\n• \2', text)
+    text = _RE_PARAGRAPH.sub(r'\1.\n• \2', text)
     
-    # Разбиваем очень длинные строки (более 120 символов) по смыслу
-    lines = []
+    # Разбиваем очень длинные строки (более 120 символов) по смыслу.
+    # Пустые строки и лишние маркеры отбрасываем в том же проходе
+    result_lines = []
     for line in text.split('\n'):
         line = line.strip()
         if len(line) > 120 and not line.startswith('•'):
             # Пытаемся разбить по запятым или точкам с запятой
-            parts = re.split(r'([,;])\s*(?=[А-Я])', line)
+            parts = _RE_LONG_LINE_SPLIT.split(line)
             current_line = ''
             for i in range(0, len(parts), 2):
                 part = parts[i]
                 if i + 1 < len(parts):
                     part += parts[i + 1]  # добавляем запятую/точку с запятой
                 
-                if len(current_line + part) > 100 and current_line:
-                    lines.append(current_line.strip())
-                    current_line = '• ' + part.strip() if not part.strip().startswith('•') else part.strip()
+                if len(current_line) + len(part) > 100 and current_line:
+                    done = current_line.strip()
+                    if done and done not in _EMPTY_MARKERS:
+                        result_lines.append(done)
+                    part_s = part.strip()
+                    current_line = part_s if part_s[:1] == '•' else '• ' + part_s
                 else:
                     current_line += part
             
-            if current_line.strip():
-                lines.append(current_line.strip())
-        else:
-            lines.append(line)
-    
-    # Убираем пустые строки и лишние маркеры
-    result_lines = []
-    for line in lines:
-        line = line.strip()
-        if line and line != '•' and line != '**:**':
+            done = current_line.strip()
+            if done and done not in _EMPTY_MARKERS:
+                result_lines.append(done)
+        elif line and line not in _EMPTY_MARKERS:
             result_lines.append(line)
     
     return '\n'.join(result_lines).strip()
@@ -196,13 +316,20 @@ def send_alert_message(text: str, color: Optional[str]) -> bool:
         return True
     return post_to_mm(text, color)
 
+# Шаблон запроса к LLM для пакета алертов (константа модуля, подставляется через format)
+_LLM_PROMPT_TMPL = (
+    "Алерты мониторинга с метриками: {context}. "
+    "Дай подробную диагностику и 3-4 конкретных шага решения проблемы."
+)
+
 def llm_tip(prompt: str, max_tokens: int = 400) -> Optional[str]:
     """Обертка над core.llm.GigaChat с форматированием ответа под Mattermost."""
     if not _use_llm():
         print("[LLM] disabled (USE_LLM=0)")
         return None
 
-    print(f"[LLM] requesting tip for prompt: {prompt[:100]}...")
+    if _debug():
+        print(f"[LLM] requesting tip for prompt: {prompt[:100]}...")
 
     try:
         client = GigaChat()
@@ -217,61 +344,107 @@ def llm_tip(prompt: str, max_tokens: int = 400) -> Optional[str]:
             return None
 
         result = clean_llm_response(raw.strip())
-        print(f"[LLM] success: {result[:100]}...")
+        if _debug():
+            print(f"[LLM] success: {result[:100]}...")
         return result
     except Exception as e:
         print(f"[LLM] chat EXC: {e}")
         return None
 
+# Кэш рекомендаций: повторные срабатывания тех же групп (флаппинг, повтор
+# после окна throttling) не гоняют запрос к GigaChat заново
+_LLM_CACHE_MAX = 1024
+_llm_tip_cache: Dict[frozenset, tuple] = {}
+_llm_tip_cache_lock = threading.Lock()
+
+def _cached_llm_tip(prompt: str, key: Optional[frozenset], max_tokens: int = 400) -> Optional[str]:
+    """llm_tip с TTL-кэшем по набору групп алертов из промпта (LLM_CACHE_TTL_SEC)."""
+    ttl = _llm_cache_ttl()
+    if ttl <= 0 or key is None:
+        return llm_tip(prompt, max_tokens=max_tokens)
+
+    now = time.time()
+    with _llm_tip_cache_lock:
+        hit = _llm_tip_cache.get(key)
+    if hit and hit[0] > now:
+        if _debug():
+            print("[LLM] cache hit")
+        return hit[1]
+
+    tip = llm_tip(prompt, max_tokens=max_tokens)
+    if tip:
+        with _llm_tip_cache_lock:
+            _llm_tip_cache.pop(key, None)
+            if len(_llm_tip_cache) >= _LLM_CACHE_MAX:
+                # Сначала выкидываем протухшие, если не хватило — самые старые
+                for k in [k for k, (exp, _) in _llm_tip_cache.items() if exp <= now]:
+                    del _llm_tip_cache[k]
+                while len(_llm_tip_cache) >= _LLM_CACHE_MAX:
+                    del _llm_tip_cache[next(iter(_llm_tip_cache))]
+            _llm_tip_cache[key] = (now + ttl, tip)
+    return tip
+
 # ---------------------------
 # Форматирование алертов (Final Fantasy style)
 # ---------------------------
+_SEVERITY_EMOJI = MappingProxyType({
+    "critical": "💎🔥",  # Critical - красный кристалл с огнем
+    "high": "⚔️",       # High - меч
+    "warning": "🛡️",    # Warning - щит
+    "info": "✨",       # Info - звездочка
+    "low": "🌟"         # Low - обычная звезда
+})
+
+# Цвет статуса firing-алерта по severity (resolved всегда зеленый)
+_FIRING_STATUS_ICONS = MappingProxyType({
+    "critical": "🔴", # красный
+    "high": "🟠",     # оранжевый
+    "warning": "🟡",  # желтый
+    "info": "🔵",     # синий
+    "low": "🟢"       # зеленый
+})
+
 def get_severity_emoji(severity: str) -> str:
     """Возвращает эмодзи и цвет для уровня критичности"""
-    sev_map = {
-        "critical": "💎🔥",  # Critical - красный кристалл с огнем
-        "high": "⚔️",       # High - меч  
-        "warning": "🛡️",    # Warning - щит
-        "info": "✨",       # Info - звездочка
-        "low": "🌟"         # Low - обычная звезда
-    }
-    return sev_map.get(severity.lower(), "❔")
+    # Alertmanager почти всегда присылает severity в нижнем регистре — .lower() только если не нашли
+    return _SEVERITY_EMOJI.get(severity) or _SEVERITY_EMOJI.get(severity.lower(), "❔")
+
+# Таблица цветов строится один раз при импорте, а не на каждый алерт
+_MM_COLORS = MappingProxyType({
+    "critical": "#FF0000",  # Красный
+    "high": "#FF8C00",      # Оранжевый
+    "warning": "#FFD700",   # Желтый
+    "info": "#00BFFF",      # Синий
+    "low": "#90EE90"        # Светло-зеленый
+})
 
 def get_mattermost_color(severity: str) -> str:
     """Возвращает цвет для Mattermost attachment"""
-    color_map = {
-        "critical": "#FF0000",  # Красный
-        "high": "#FF8C00",      # Оранжевый  
-        "warning": "#FFD700",   # Желтый
-        "info": "#00BFFF",      # Синий
-        "low": "#90EE90"        # Светло-зеленый
-    }
-    return color_map.get(severity.lower(), "#808080")
+    return _MM_COLORS.get(severity) or _MM_COLORS.get(severity.lower(), "#808080")
+
+def _alert_instance(labels: Dict[str, Any]) -> str:
+    """Источник алерта: instance, иначе pod, иначе job ("" если ничего нет)."""
+    return labels.get("instance") or labels.get("pod") or labels.get("job") or ""
 
 def fmt_alert_line(alert: Dict[str, Any], enriched: Dict[str, Any] = None, count: int = 1) -> str:
     labels = alert.get("labels", {})
     ann = alert.get("annotations", {})
     status = alert.get("status", "firing")
     name = labels.get("alertname", "Alert")
-    inst = labels.get("instance") or labels.get("pod") or labels.get("job") or "-"
+    inst = _alert_instance(labels) or "-"
     sev = labels.get("severity", "info")
+    # Ключ для таблиц нормализуем один раз (таблицы эмодзи и иконок с общими ключами)
+    sev_key = sev if sev in _SEVERITY_EMOJI else sev.lower()
     summary = ann.get("summary") or ann.get("description") or ""
     
     # FF-style иконки  
-    emoji = get_severity_emoji(sev)
+    emoji = _SEVERITY_EMOJI.get(sev_key, "❔")
     # Цвет статуса зависит от severity, а не только от firing/resolved
     if status == "resolved":
         status_icon = "🟢"  # resolved всегда зеленый
     else:
         # firing - цвет по severity
-        severity_icons = {
-            "critical": "🔴", # красный
-            "high": "🟠",     # оранжевый  
-            "warning": "🟡",  # желтый
-            "info": "🔵",     # синий
-            "low": "🟢"       # зеленый
-        }
-        status_icon = severity_icons.get(sev.lower(), "🔴")
+        status_icon = _FIRING_STATUS_ICONS.get(sev_key, "🔴")
     
     # Компактный FF-стиль с обогащенными данными
     suffix = f" ×{count}" if count and count > 1 else ""
@@ -288,26 +461,79 @@ def fmt_alert_line(alert: Dict[str, Any], enriched: Dict[str, Any] = None, count
     
     return "\n".join(lines)
 
-_alert_throttle_state: Dict[str, Dict[str, Any]] = {}
+# Порядок критичности: меньший индекс — выше приоритет
+_SEVERITY_ORDER = ("critical", "high", "warning", "info", "low")
+_SEVERITY_RANK = MappingProxyType({s: i for i, s in enumerate(_SEVERITY_ORDER)})
+
+_alert_throttle_state: Dict[tuple, Dict[str, Any]] = {}
+
+# fmt_batch_message вызывается из очереди, RabbitMQ-потока и админки одновременно
+_alert_throttle_lock = threading.Lock()
 
-def _make_alert_key(alert: Dict[str, Any]) -> str:
+def _throttle_check_and_mark(key: tuple, count: int, now: float) -> bool:
+    """
+    Атомарно учитывает count срабатываний ключа в текущем окне и
+    возвращает True, если группу нужно подавить.
+    """
+    with _alert_throttle_lock:
+        st = _alert_throttle_state.get(key)
+        if not st or now - st.get("first_ts", 0) > _throttle_window():
+            st = {"first_ts": now, "count": 0}
+        st["count"] += count
+        _alert_throttle_state[key] = st
+        return st["count"] > _throttle_max()
+
+def _make_alert_key(alert: Dict[str, Any]) -> tuple:
     labels = alert.get("labels", {}) or {}
     name = labels.get("alertname", "")
-    inst = labels.get("instance") or labels.get("pod") or labels.get("job") or ""
+    inst = _alert_instance(labels)
     sev = labels.get("severity", "")
     status = alert.get("status", "firing")
-    return f"{name}|{inst}|{sev}|{status}"
+    # Кортеж вместо f-строки: без форматирования на каждый алерт
+    # и без коллизий, если в метках встречается "|"
+    return (name, inst, sev, status)
+
+# Пул для параллельного обогащения/плагинов внутри одного пакета алертов
+_alert_pool = ThreadPoolExecutor(
+    max_workers=max(1, _env_int("ALERT_ANALYZE_WORKERS", 8)),
+    thread_name_prefix="seed-analyze",
+)
+
+def _analyze_alert(a: Dict[str, Any]) -> tuple:
+    """Обогащение из Prometheus + плагин для одного алерта: (enriched, plugin_result)."""
+    # Обогащаем алерт данными из Prometheus
+    enriched: Dict[str, Any] = {}
+    if ENRICHMENT_AVAILABLE and _prom_url():
+        try:
+            enriched = enrich_alert(a)
+            if _debug():
+                print(f"[ENRICH] {a.get('labels', {}).get('alertname', 'Alert')}: {enriched.get('summary_line', 'no data')}")
+        except Exception as e:
+            print(f"[ENRICH] failed: {e}")
 
-def fmt_batch_message(alerts: List[Dict[str, Any]]) -> tuple:
-    """Возвращает (текст_сообщения, цвет_для_mattermost) с простым dedup/throttling."""
+    # Запускаем плагин для алерта
+    plugin_result: Optional[Dict[str, Any]] = None
+    if PLUGINS_READY:
+        try:
+            plugin_result = plugin_router.run_plugin(a, prom)
+        except Exception as e:
+            print(f"[PLUGIN] Error processing alert: {e}")
+
+    return enriched, plugin_result
+
+def _fmt_batch(alerts: List[Dict[str, Any]]) -> tuple:
+    """
+    Возвращает (текст_без_LLM, цвет_для_mattermost, промпт_для_LLM_или_None,
+    ключ_кэша_LLM) с простым dedup/throttling. Сам LLM не вызывает.
+    """
     if not alerts:
-        return "🌌 **SEED Crystal** - No alerts detected", None
+        return "🌌 **SEED Crystal** - No alerts detected", None, None, None
 
     # FF-style заголовок
     head = "🌌 **S.E.E.D.** - Smart Event Explainer & Diagnostics\n" + "═" * 55
 
     # Группируем одинаковые алерты (по alertname+instance+severity+status)
-    grouped: Dict[str, Dict[str, Any]] = {}
+    grouped: Dict[tuple, Dict[str, Any]] = {}
     for a in alerts:
         key = _make_alert_key(a)
         g = grouped.setdefault(key, {"alert": a, "count": 0})
@@ -316,52 +542,64 @@ def fmt_batch_message(alerts: List[Dict[str, Any]]) -> tuple:
     lines: List[str] = []
     severities: List[str] = []
     llm_context: List[str] = []
+    llm_keys: List[tuple] = []
     plugin_results: List[Dict[str, Any]] = []
-    throttled_keys: List[str] = []
+    throttled_keys: List[tuple] = []
 
     now = time.time()
 
+    # Алерты ниже LLM_MIN_SEVERITY в LLM-контекст не попадают: если в пакете
+    # других нет, дорогой запрос к LLM не делается вовсе
+    llm_min_rank = _llm_min_severity() if _use_llm() else None
+
+    # Сначала throttling (дёшево, последовательно), затем тяжёлая часть.
+    # Флаг из env читаем один раз на пакет, а не на каждую группу
+    throttle = _throttle_enable()
+    pending: List[tuple] = []
     for key, info in grouped.items():
-        a = info["alert"]
         count = info["count"]
 
         # Простое throttling по ключу
-        if _throttle_enable():
-            st = _alert_throttle_state.get(key)
-            if not st or now - st.get("first_ts", 0) > _throttle_window():
-                st = {"first_ts": now, "count": 0}
-            st["count"] += count
-            _alert_throttle_state[key] = st
-            if st["count"] > _throttle_max():
-                throttled_keys.append(key)
-                continue
+        if throttle and _throttle_check_and_mark(key, count, now):
+            throttled_keys.append(key)
+            continue
 
-        # Обогащаем алерт данными из Prometheus
-        enriched: Dict[str, Any] = {}
-        if ENRICHMENT_AVAILABLE and _prom_url():
-            try:
-                enriched = enrich_alert(a)
-                print(f"[ENRICH] {a.get('labels', {}).get('alertname', 'Alert')}: {enriched.get('summary_line', 'no data')}")
-            except Exception as e:
-                print(f"[ENRICH] failed: {e}")
-
-        # Запускаем плагин для алерта
-        plugin_result: Optional[Dict[str, Any]] = None
-        if PLUGINS_AVAILABLE and plugin_router and PROM_CLIENT_AVAILABLE and prom:
-            try:
-                plugin_result = plugin_router.run_plugin(a, prom)
-                if plugin_result:
-                    plugin_results.append(plugin_result)
-            except Exception as e:
-                print(f"[PLUGIN] Error processing alert: {e}")
-
-        lines.append(fmt_alert_line(a, enriched, count=count))
-        severities.append(a.get("labels", {}).get("severity", "info"))
+        pending.append((key, info["alert"], count))
+
+    # Prometheus и плагины — это сетевые запросы: для пакета из нескольких
+    # групп выполняем их параллельно, порядок результатов сохраняется
+    if len(pending) > 1:
+        analyzed = list(_alert_pool.map(_analyze_alert, [a for _, a, _ in pending]))
+    else:
+        analyzed = [_analyze_alert(a) for _, a, _ in pending]
+
+    for (key, a, count), (enriched, plugin_result) in zip(pending, analyzed):
+        if plugin_result:
+            plugin_results.append(plugin_result)
 
-        # Создаем более богатый контекст для LLM
         labels = a.get("labels", {})
         ann = a.get("annotations", {})
-        alert_context = f"{labels.get('alertname', 'Alert')} (x{count}): {ann.get('summary', '')}" if count > 1 else f"{labels.get('alertname', 'Alert')}: {ann.get('summary', '')}"
+
+        sev = labels.get("severity", "info")
+        lines.append(fmt_alert_line(a, enriched, count))
+        severities.append(sev)
+
+        # Решённые алерты диагностировать незачем — контекст для LLM не собираем
+        # (если в пакете только resolved, запроса к LLM не будет вовсе)
+        if a.get("status") == "resolved":
+            continue
+
+        if llm_min_rank is not None:
+            rank = _SEVERITY_RANK.get(sev)
+            if rank is None:
+                rank = _SEVERITY_RANK.get(str(sev).lower(), len(_SEVERITY_ORDER))
+            if rank > llm_min_rank:
+                continue
+
+        # Создаем более богатый контекст для LLM
+        name = labels.get("alertname", "Alert")
+        summary = ann.get("summary", "")
+        alert_context = f"{name} (x{count}): {summary}" if count > 1 else f"{name}: {summary}"
 
         # Добавляем метрики в контекст для LLM
         if enriched.get("summary_line"):
@@ -373,10 +611,12 @@ def fmt_batch_message(alerts: List[Dict[str, Any]]) -> tuple:
             alert_context += f" | Плагин: {plugin_summary}"
 
         llm_context.append(alert_context)
+        llm_keys.append(key)
 
-    text = head
+    # Части сообщения собираем в список и склеиваем один раз в конце
+    parts: List[str] = [head]
     if lines:
-        text += "\n\n" + "\n\n".join(lines)
+        parts.append("\n\n" + "\n\n".join(lines))
     
     # Краткая статистика
     if len(alerts) > 1:
@@ -384,56 +624,88 @@ def fmt_batch_message(alerts: List[Dict[str, Any]]) -> tuple:
         for s in severities:
             sev_counts[s] = sev_counts.get(s, 0) + 1
         stats = " | ".join([f"{get_severity_emoji(s)} {s}:{c}" for s, c in sev_counts.items()])
-        text += f"\n\n📊 **Summary:** {stats}"
+        parts.append(f"\n\n📊 **Summary:** {stats}")
 
     # Информация о throttling (если что-то было подавлено)
     if throttled_keys:
-        text += f"\n\n⏱ **Throttling:** suppressed {len(throttled_keys)} alert group(s) in the last {_throttle_window()}s"
+        parts.append(f"\n\n⏱ **Throttling:** suppressed {len(throttled_keys)} alert group(s) in the last {_throttle_window()}s")
     
     # Результаты плагинов (детальная диагностика)
     if plugin_results:
-        text += f"\n\n🔧 **Детальная диагностика:**"
+        parts.append("\n\n🔧 **Детальная диагностика:**")
         for result in plugin_results[:2]:  # Максимум 2 плагина, чтобы не перегружать
             if result.get("title") and result.get("lines"):
-                text += f"\n\n**{result['title']}**\n"
+                parts.append(f"\n\n**{result['title']}**\n")
                 # Ограничиваем количество строк от плагина
                 plugin_lines = result["lines"][:8]  # Максимум 8 строк
-                text += "\n".join(plugin_lines)
+                parts.append("\n".join(plugin_lines))
     
-    # LLM рекомендация с обогащенным контекстом
-    if _use_llm() and len(alerts) > 0:
-        # Используем обогащенный контекст для более точных рекомендаций
+    text = "".join(parts)
+
+    # Промпт для LLM с обогащенным контекстом.
+    # Если все группы подавлены throttling — контекста нет, в LLM не ходим
+    prompt = None
+    llm_key = None
+    if _use_llm() and llm_context:
         context_str = "; ".join(llm_context[:3])  # Первые 3 алерта
-        prompt = f"Алерты мониторинга с метриками: {context_str}. Дай подробную диагностику и 3-4 конкретных шага решения проблемы."
-        tip = llm_tip(prompt, max_tokens=400)
-        if tip:
-            text += f"\n\n🧠 **Магия кристалла:** {tip}"
-    
-    # Определяем цвет по наивысшей критичности
-    priority = ["critical", "high", "warning", "info", "low"]
-    highest_sev = "info"
-    for sev in priority:
-        if sev in severities:
-            highest_sev = sev
-            break
+        prompt = _LLM_PROMPT_TMPL.format(context=context_str)
+        # Ключ кэша — те же группы, что попали в промпт (метрики в нём меняются)
+        llm_key = frozenset(llm_keys[:3])
     
+    # Определяем цвет по наивысшей критичности — один проход по severities
+    best = min((_SEVERITY_RANK[s] for s in severities if s in _SEVERITY_RANK), default=None)
+    highest_sev = _SEVERITY_ORDER[best] if best is not None else "info"
+
     color = get_mattermost_color(highest_sev)
+    return text, color, prompt, llm_key
+
+def fmt_batch_message(alerts: List[Dict[str, Any]]) -> tuple:
+    """Возвращает (текст_сообщения, цвет_для_mattermost) с LLM-рекомендацией внутри."""
+    text, color, prompt, llm_key = _fmt_batch(alerts)
+    if prompt:
+        tip = _cached_llm_tip(prompt, llm_key, max_tokens=400)
+        if tip:
+            text += f"\n\n🧠 **Магия кристалла:** {tip}"
     return text, color
 
+def deliver_alerts(alerts: List[Dict[str, Any]]) -> tuple:
+    """
+    Единый путь доставки для HTTP-вебхуков, RabbitMQ и админки:
+    форматирует пакет и отправляет его. Возвращает (ok, текст_сообщения).
+    """
+    if not _llm_followup():
+        text, color = fmt_batch_message(alerts)
+        return send_alert_message(text, color), text
+
+    # LLM_FOLLOWUP=1: сначала быстрое сообщение без LLM, рекомендация — отдельным
+    # сообщением, когда GigaChat ответит (LLM не задерживает сам алерт)
+    text, color, prompt, llm_key = _fmt_batch(alerts)
+    ok = send_alert_message(text, color)
+    if prompt:
+        tip = _cached_llm_tip(prompt, llm_key, max_tokens=400)
+        if tip:
+            send_alert_message(f"🧠 **Магия кристалла:** {tip}", color)
+    return ok, text
+
 # ---------------------------
 # FastAPI приложение
 # ---------------------------
-app = FastAPI(title="SEED v6 Agent")
+async def _read_json(req: Request) -> Any:
+    """Тело запроса как JSON: через orjson, если он установлен (Starlette req.json() — stdlib json)."""
+    return _json_loads(await req.body())
+
+app = FastAPI(title="SEED v6 Agent", default_response_class=DEFAULT_RESPONSE_CLASS)
 
 @app.get("/health")
 async def health():
+    prom_url = _prom_url()  # читаем env один раз на запрос
     health_info = {
         "status": "ok",
         "mm_webhook": bool(_mm_webhook()),
         "use_llm": _use_llm(),
         "rabbit_enabled": RABBIT_ENABLE,
-        "prometheus_enrichment": ENRICHMENT_AVAILABLE and bool(_prom_url()),
-        "prometheus_url": _prom_url() or None,
+        "prometheus_enrichment": ENRICHMENT_AVAILABLE and bool(prom_url),
+        "prometheus_url": prom_url or None,
         "dry_run": _dry_run(),
         "version": "v6.2",
     }
@@ -456,10 +728,13 @@ async def health():
     
     return health_info
 
+# Имя узла за время жизни процесса не меняется — берём один раз
+_NODENAME = os.uname().nodename
+
 @app.post("/test")
 async def test_endpoint(req: Request):
     try:
-        body = await req.json()
+        body = await _read_json(req)
     except Exception:
         body = {}
     # Синтетический alertmanager-пакет
@@ -469,7 +744,7 @@ async def test_endpoint(req: Request):
                 "status": "firing",
                 "labels": {
                     "alertname": body.get("alertname", "SeedTest"),
-                    "instance":  body.get("instance",  os.uname().nodename),
+                    "instance":  body.get("instance",  _NODENAME),
                     "severity":  body.get("severity",  "warning")
                 },
                 "annotations": {
@@ -478,29 +753,247 @@ async def test_endpoint(req: Request):
             }
         ]
     }
-    text, color = fmt_batch_message(pkg["alerts"])
-    ok = send_alert_message(text, color)
+    ok, text = await run_in_threadpool(deliver_alerts, pkg["alerts"])
     return {"ok": ok, "sent_text": text}
 
+# ---------------------------
+# Очередь входящих алертов: всплески вебхуков склеиваются в один пакет,
+# чтобы одинаковые алерты ушли одним сообщением и одним запросом к LLM
+# ---------------------------
+def _batch_max() -> int:
+    return _env_int("ALERT_BATCH_MAX", 32)
+
+def _batch_wait_sec() -> float:
+    return _env_int("ALERT_BATCH_WAIT_MS", 200) / 1000.0
+
+# Размер очереди и число воркеров доставки читаются при старте (как порт и очередь RabbitMQ)
+ALERT_QUEUE_MAX = _env_int("ALERT_QUEUE_MAX", 1024)
+ALERT_QUEUE_WORKERS = max(1, _env_int("ALERT_QUEUE_WORKERS", 2))
+
+# Один сборщик склеивает всплески из _ingest_q и раскладывает их по группам,
+# группы уходят воркерам доставки. Группа всегда попадает к одному и тому же
+# воркеру: склейка не делится между воркерами, а firing/resolved одной группы
+# отправляются в порядке поступления
+_ingest_q: Optional[asyncio.Queue] = None
+_deliver_qs: List[asyncio.Queue] = []
+_ingest_tasks: Dict[str, asyncio.Task] = {}
+_ingest_stopping = False
+
+# Маркер остановки: кладётся в очередь после алертов,
+# поэтому всё, что пришло раньше, успевает уйти
+_STOP_WORKER = object()
+
+def _alerts_shape_error(alerts: List[Any]) -> Optional[str]:
+    """
+    Проверка формы алертов до постановки в очередь. После ответа 202 битый
+    алерт отправителю уже не вернуть, а в общем пакете он ломал бы доставку чужих.
+    """
+    for i, a in enumerate(alerts):
+        if not isinstance(a, dict):
+            return f"alerts[{i}] is not an object"
+        if not isinstance(a.get("status", ""), str):
+            return f"alerts[{i}].status is not a string"
+        for field in ("labels", "annotations"):
+            values = a.get(field, {})
+            if not isinstance(values, dict):
+                return f"alerts[{i}].{field} is not an object"
+            for k, v in values.items():
+                if not isinstance(v, str):
+                    return f"alerts[{i}].{field}.{k} is not a string"
+    return None
+
+def _bucket_batch(items: List[tuple]) -> Dict[tuple, List[List[Dict[str, Any]]]]:
+    """
+    Раскладывает собранные вебхуки по группам: у каждой группы своё сообщение
+    и свой запрос к LLM. Внутри группы вебхуки остаются отдельными списками,
+    чтобы при ошибке можно было доставить их по одному.
+    """
+    buckets: Dict[tuple, List[List[Dict[str, Any]]]] = {}
+    for group_key, alerts in items:
+        if group_key:
+            buckets.setdefault(("group", group_key), []).append(alerts)
+            continue
+        # Без groupKey — по ключу throttling без статуса: firing и resolved
+        # одного алерта остаются в одной группе
+        parts: Dict[tuple, List[Dict[str, Any]]] = {}
+        for a in alerts:
+            parts.setdefault(_make_alert_key(a)[:3], []).append(a)
+        for key, part in parts.items():
+            buckets.setdefault(("alert",) + key, []).append(part)
+    return buckets
+
+def _deliver_bucket(parts: List[List[Dict[str, Any]]]) -> None:
+    """Доставляет группу одним сообщением; если не вышло — каждый вебхук отдельно."""
+    try:
+        deliver_alerts([a for part in parts for a in part])
+        return
+    except Exception as e:
+        if len(parts) == 1:
+            print(f"[QUEUE] delivery error, {len(parts[0])} alert(s) dropped: {e}")
+            return
+        print(f"[QUEUE] delivery error: {e}; retrying {len(parts)} webhooks one by one")
+    # Один отправитель не должен утянуть за собой алерты остальных
+    for part in parts:
+        try:
+            deliver_alerts(part)
+        except Exception as e:
+            print(f"[QUEUE] delivery error, {len(part)} alert(s) dropped: {e}")
+
+async def _batch_collector():
+    loop = asyncio.get_running_loop()
+    while True:
+        # Элемент очереди — (groupKey Alertmanager или None, алерты одного вебхука)
+        item = await _ingest_q.get()
+        if item is _STOP_WORKER:
+            return
+        stop = False
+        try:
+            items = [item]
+            count = len(item[1])
+            deadline = loop.time() + _batch_wait_sec()
+            batch_max = _batch_max()
+            while count < batch_max:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(_ingest_q.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP_WORKER:
+                    # Собранное раздаём, после этого выходим
+                    stop = True
+                    break
+                items.append(item)
+                count += len(item[1])
+            for key, parts in _bucket_batch(items).items():
+                await _deliver_qs[hash(key) % len(_deliver_qs)].put(parts)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Сборщик не должен умирать: иначе вебхук отвечает 202, а очередь никто не разбирает
+            print(f"[QUEUE] batching error: {e}")
+        if stop:
+            return
+
+async def _delivery_worker(q: asyncio.Queue):
+    while True:
+        parts = await q.get()
+        if parts is _STOP_WORKER:
+            return
+        try:
+            # deliver_alerts блокирующий (HTTP к Prometheus/LLM/MM) — в пул потоков
+            await run_in_threadpool(_deliver_bucket, parts)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[QUEUE] delivery error: {e}")
+
+def _spawn_ingest_task(name: str, make_coro) -> None:
+    task = asyncio.create_task(make_coro())
+    task.add_done_callback(lambda t: _on_ingest_task_done(name, make_coro, t))
+    _ingest_tasks[name] = task
+
+def _on_ingest_task_done(name: str, make_coro, task: asyncio.Task) -> None:
+    if task.cancelled() or task.exception() is None:
+        return  # штатная остановка
+    print(f"[QUEUE] {name} died: {task.exception()!r}")
+    # Перезапуск с паузой, чтобы постоянно падающая задача не крутилась вхолостую
+    asyncio.get_running_loop().call_later(1.0, _restart_ingest_task, name, make_coro)
+
+def _restart_ingest_task(name: str, make_coro) -> None:
+    if not _ingest_stopping:
+        print(f"[QUEUE] restarting {name}")
+        _spawn_ingest_task(name, make_coro)
+
+@app.on_event("startup")
+async def _start_ingest_worker():
+    global _ingest_q, _ingest_stopping
+    _ingest_q = asyncio.Queue(maxsize=ALERT_QUEUE_MAX)
+    _ingest_stopping = False
+    # Задачи и очереди от прошлого запуска жили в другом event loop
+    _ingest_tasks.clear()
+    _deliver_qs[:] = [asyncio.Queue(maxsize=ALERT_QUEUE_MAX) for _ in range(ALERT_QUEUE_WORKERS)]
+    _spawn_ingest_task("collector", _batch_collector)
+    # Несколько воркеров доставки: пока одна группа ждёт LLM/Mattermost, другие уже обрабатываются
+    for i, q in enumerate(_deliver_qs):
+        _spawn_ingest_task(f"delivery-{i}", lambda q=q: _delivery_worker(q))
+
+@app.on_event("shutdown")
+async def _stop_ingest_worker():
+    global _ingest_stopping
+    _ingest_stopping = True
+    if _ingest_q is None:
+        return
+    # Не отменяем задачи: собранный, но ещё не доставленный пакет иначе потерялся бы.
+    # Сначала сборщик доходит до маркера и раздаёт собранное, затем воркеры
+    # доставки доходят до своих маркеров
+    await _ingest_q.put(_STOP_WORKER)
+    collector = _ingest_tasks.get("collector")
+    if collector is not None:
+        await asyncio.gather(collector, return_exceptions=True)
+    for q in _deliver_qs:
+        await q.put(_STOP_WORKER)
+    workers = [t for name, t in _ingest_tasks.items() if name != "collector"]
+    await asyncio.gather(*workers, return_exceptions=True)
+
+    # Досылаем то, что осталось в очередях после маркеров
+    items = []
+    while not _ingest_q.empty():
+        item = _ingest_q.get_nowait()
+        if item is not _STOP_WORKER:
+            items.append(item)
+    leftovers = list(_bucket_batch(items).values())
+    for q in _deliver_qs:
+        while not q.empty():
+            parts = q.get_nowait()
+            if parts is not _STOP_WORKER:
+                leftovers.append(parts)
+    for parts in leftovers:
+        await run_in_threadpool(_deliver_bucket, parts)
+
 @app.post("/alertmanager")
 async def alertmanager_webhook(req: Request):
     try:
-        payload = await req.json()
+        payload = await _read_json(req)
     except Exception:
-        return JSONResponse({"error": "invalid json"}, status_code=400)
+        return DEFAULT_RESPONSE_CLASS({"error": "invalid json"}, status_code=400)
 
-    alerts = payload.get("alerts")
+    alerts = payload.get("alerts") if isinstance(payload, dict) else None
     if not isinstance(alerts, list):
-        return JSONResponse({"error": "no alerts[]"}, status_code=400)
+        return DEFAULT_RESPONSE_CLASS({"error": "no alerts[]"}, status_code=400)
 
-    text, color = fmt_batch_message(alerts)
-    ok = send_alert_message(text, color)
-    return {"ok": ok}
+    # Пустой пакет (пробы, тестовые вызовы) — в очередь не кладём и ничего не шлём
+    if not alerts:
+        return {"ok": True, "queued": 0}
+
+    # Битый алерт отклоняем сразу, пока отправитель может исправить и повторить
+    error = _alerts_shape_error(alerts)
+    if error:
+        return DEFAULT_RESPONSE_CLASS({"error": error}, status_code=400)
+
+    # Некуда отправлять — не тратим время на обогащение, плагины и LLM
+    if not _delivery_enabled():
+        return {"ok": False, "error": "no delivery channel (MM_WEBHOOK is empty)"}
+
+    group_key = payload.get("groupKey")
+    if not isinstance(group_key, str):
+        group_key = None
+
+    # Alertmanager'у нужно только подтверждение — обработка идёт в фоне.
+    # Очередь переполнена — не держим соединение, а отвечаем 503: Alertmanager повторит
+    try:
+        _ingest_q.put_nowait((group_key, alerts))
+    except asyncio.QueueFull:
+        print("[QUEUE] ingest queue is full, rejecting webhook")
+        return DEFAULT_RESPONSE_CLASS({"ok": False, "error": "ingest queue is full"}, status_code=503)
+    return DEFAULT_RESPONSE_CLASS({"ok": True, "queued": len(alerts)}, status_code=202)
 
 # ---------------------------
 # Admin panel: статика + API
 # ---------------------------
 STATIC_DIR = os.path.join(BASE_DIR, "static")
+ADMIN_HTML = os.path.join(STATIC_DIR, "admin.html")
 ALERTS_YAML = os.path.join(BASE_DIR, "configs", "alerts.yaml")
 
 # Отдаём /static/* (иконки, css и т.п.)
@@ -509,9 +1002,8 @@ if os.path.isdir(STATIC_DIR):
 
 @app.get("/admin")
 async def admin_page():
-    html_path = os.path.join(STATIC_DIR, "admin.html")
-    if os.path.exists(html_path):
-        return FileResponse(html_path, media_type="text/html")
+    if os.path.exists(ADMIN_HTML):
+        return FileResponse(ADMIN_HTML, media_type="text/html")
     return HTMLResponse("<h1>admin.html not found</h1>", status_code=404)
 
 @app.get("/")
@@ -519,8 +1011,11 @@ async def index():
     """Главная страница — просто отдаём админ‑панель."""
     return await admin_page()
 
+# Обработчики админки ниже без await и только читают/пишут файлы (yaml, listdir,
+# stat) — объявлены обычными def: FastAPI выполняет их в пуле потоков,
+# и медленный диск не блокирует event loop с вебхуками
 @app.get("/admin/env")
-async def admin_get_env():
+def admin_get_env():
     """Вернуть текущие ключи из configs/seed.env (без секретов полностью)."""
     data: Dict[str, str] = {}
     if os.path.exists(ENV_PATH):
@@ -538,30 +1033,33 @@ async def admin_get_env():
 async def admin_put_env(req: Request):
     """Записать seed.env и сразу применить переменные в os.environ (hot-reload)."""
     try:
-        body = await req.json()
+        body = await _read_json(req)
     except Exception:
-        return JSONResponse({"ok": False, "error": "invalid json"}, 400)
+        return DEFAULT_RESPONSE_CLASS({"ok": False, "error": "invalid json"}, 400)
 
+    try:
+        # Запись на диск — в пуле потоков, чтобы не держать event loop с вебхуками
+        await run_in_threadpool(_write_env, body)
+        print("[ADMIN] Config reloaded from admin panel (hot-reload)")
+        return {"ok": True, "note": "Applied immediately — no restart needed"}
+    except Exception as e:
+        return DEFAULT_RESPONSE_CLASS({"ok": False, "error": str(e)}, 500)
+
+def _write_env(body: Dict[str, Any]) -> None:
     lines: List[str] = []
     for k, v in body.items():
         lines.append(f"{k}={v}")
 
-    try:
-        os.makedirs(os.path.dirname(ENV_PATH), exist_ok=True)
-        with open(ENV_PATH, "w", encoding="utf-8") as f:
-            f.write("\n".join(lines) + "\n")
-
-        # Применяем новые значения сразу в текущий процесс
-        for k, v in body.items():
-            os.environ[k] = str(v)
+    os.makedirs(os.path.dirname(ENV_PATH), exist_ok=True)
+    with open(ENV_PATH, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
 
-        print("[ADMIN] Config reloaded from admin panel (hot-reload)")
-        return {"ok": True, "note": "Applied immediately — no restart needed"}
-    except Exception as e:
-        return JSONResponse({"ok": False, "error": str(e)}, 500)
+    # Применяем новые значения сразу в текущий процесс
+    for k, v in body.items():
+        os.environ[k] = str(v)
 
 @app.get("/admin/routes")
-async def admin_get_routes():
+def admin_get_routes():
     """Вернуть текущие маршруты из alerts.yaml + список доступных плагинов."""
     data: Dict[str, Any] = {"routes": [], "default_plugin": "echo", "available_plugins": []}
     if os.path.exists(ALERTS_YAML):
@@ -573,7 +1071,7 @@ async def admin_get_routes():
     plugins_dir = os.path.join(BASE_DIR, "plugins")
     if os.path.isdir(plugins_dir):
         data["available_plugins"] = sorted(
-            f.replace(".py", "")
+            f[:-3]  # endswith(".py") уже проверен — просто отрезаем суффикс
             for f in os.listdir(plugins_dir)
             if f.endswith(".py") and f != "__init__.py"
         )
@@ -583,9 +1081,9 @@ async def admin_get_routes():
 async def admin_put_routes(req: Request):
     """Сохранить маршруты в alerts.yaml и горячий релоад."""
     try:
-        body = await req.json()
+        body = await _read_json(req)
     except Exception:
-        return JSONResponse({"ok": False, "error": "invalid json"}, 400)
+        return DEFAULT_RESPONSE_CLASS({"ok": False, "error": "invalid json"}, 400)
 
     cfg = {
         "routes": body.get("routes", []),
@@ -593,17 +1091,20 @@ async def admin_put_routes(req: Request):
         "default_params": body.get("default_params", {"show_basic_info": True}),
     }
     try:
-        os.makedirs(os.path.dirname(ALERTS_YAML), exist_ok=True)
-        with open(ALERTS_YAML, "w", encoding="utf-8") as f:
-            yaml.dump(cfg, f, default_flow_style=False, allow_unicode=True, sort_keys=False)
-
-        if PLUGINS_AVAILABLE and plugin_router:
-            plugin_router.load_config()
-            print("[ADMIN] Routes reloaded")
-
+        # Запись yaml и перечитывание маршрутов — в пуле потоков
+        await run_in_threadpool(_write_routes, cfg)
         return {"ok": True}
     except Exception as e:
-        return JSONResponse({"ok": False, "error": str(e)}, 500)
+        return DEFAULT_RESPONSE_CLASS({"ok": False, "error": str(e)}, 500)
+
+def _write_routes(cfg: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(ALERTS_YAML), exist_ok=True)
+    with open(ALERTS_YAML, "w", encoding="utf-8") as f:
+        yaml.dump(cfg, f, default_flow_style=False, allow_unicode=True, sort_keys=False)
+
+    if PLUGINS_AVAILABLE and plugin_router:
+        plugin_router.load_config()
+        print("[ADMIN] Routes reloaded")
 
 PLUGINS_DIR = os.path.join(BASE_DIR, "plugins")
 
@@ -640,7 +1141,7 @@ def run(alert: dict, prom, params: dict) -> dict:
 '''
 
 @app.get("/admin/plugins")
-async def admin_list_plugins():
+def admin_list_plugins():
     """Список плагинов в plugins/ с размером и датой изменения."""
     os.makedirs(PLUGINS_DIR, exist_ok=True)
     result = []
@@ -650,7 +1151,7 @@ async def admin_list_plugins():
         fpath = os.path.join(PLUGINS_DIR, fname)
         stat = os.stat(fpath)
         result.append({
-            "name": fname.replace(".py", ""),
+            "name": fname[:-3],
             "file": fname,
             "size": stat.st_size,
             "mtime": int(stat.st_mtime),
@@ -658,11 +1159,11 @@ async def admin_list_plugins():
     return {"plugins": result}
 
 @app.get("/admin/plugins/{name}")
-async def admin_get_plugin(name: str):
+def admin_get_plugin(name: str):
     """Вернуть исходный код плагина."""
     fpath = os.path.join(PLUGINS_DIR, f"{name}.py")
     if not os.path.exists(fpath):
-        return JSONResponse({"ok": False, "error": "not found"}, 404)
+        return DEFAULT_RESPONSE_CLASS({"ok": False, "error": "not found"}, 404)
     with open(fpath, "r", encoding="utf-8") as f:
         code = f.read()
     return {"ok": True, "name": name, "code": code}
@@ -671,80 +1172,90 @@ async def admin_get_plugin(name: str):
 async def admin_put_plugin(name: str, req: Request):
     """Создать или обновить плагин (сохранить Python-код)."""
     try:
-        body = await req.json()
+        body = await _read_json(req)
     except Exception:
-        return JSONResponse({"ok": False, "error": "invalid json"}, 400)
+        return DEFAULT_RESPONSE_CLASS({"ok": False, "error": "invalid json"}, 400)
 
     code = body.get("code", "")
     if not code.strip():
-        return JSONResponse({"ok": False, "error": "empty code"}, 400)
+        return DEFAULT_RESPONSE_CLASS({"ok": False, "error": "empty code"}, 400)
 
-    os.makedirs(PLUGINS_DIR, exist_ok=True)
-    fpath = os.path.join(PLUGINS_DIR, f"{name}.py")
     try:
-        with open(fpath, "w", encoding="utf-8") as f:
-            f.write(code)
-        # Сбросить кэш плагина в роутере, чтобы следующий вызов перезагрузил его
-        if PLUGINS_AVAILABLE and plugin_router and name in plugin_router.plugins_cache:
-            del plugin_router.plugins_cache[name]
+        # Запись файла плагина — в пуле потоков
+        await run_in_threadpool(_write_plugin, name, code)
         return {"ok": True}
     except Exception as e:
-        return JSONResponse({"ok": False, "error": str(e)}, 500)
+        return DEFAULT_RESPONSE_CLASS({"ok": False, "error": str(e)}, 500)
+
+def _write_plugin(name: str, code: str) -> None:
+    os.makedirs(PLUGINS_DIR, exist_ok=True)
+    fpath = os.path.join(PLUGINS_DIR, f"{name}.py")
+    with open(fpath, "w", encoding="utf-8") as f:
+        f.write(code)
+    # Сбросить кэш плагина в роутере, чтобы следующий вызов перезагрузил его
+    if PLUGINS_AVAILABLE and plugin_router:
+        plugin_router.plugins_cache.pop(name, None)
 
 @app.delete("/admin/plugins/{name}")
-async def admin_delete_plugin(name: str):
+def admin_delete_plugin(name: str):
     """Удалить плагин."""
     fpath = os.path.join(PLUGINS_DIR, f"{name}.py")
     if not os.path.exists(fpath):
-        return JSONResponse({"ok": False, "error": "not found"}, 404)
+        return DEFAULT_RESPONSE_CLASS({"ok": False, "error": "not found"}, 404)
     try:
         os.remove(fpath)
         if PLUGINS_AVAILABLE and plugin_router and name in plugin_router.plugins_cache:
             del plugin_router.plugins_cache[name]
         return {"ok": True}
     except Exception as e:
-        return JSONResponse({"ok": False, "error": str(e)}, 500)
+        return DEFAULT_RESPONSE_CLASS({"ok": False, "error": str(e)}, 500)
+
+@lru_cache(maxsize=64)
+def _render_plugin_template(name: str) -> str:
+    """Шаблон статичен — рендерим один раз на имя плагина."""
+    return PLUGIN_TEMPLATE.format(name=name)
 
 @app.get("/admin/plugin_template/{name}")
 async def admin_plugin_template(name: str):
     """Вернуть шаблон нового плагина с подставленным именем."""
-    code = PLUGIN_TEMPLATE.format(name=name)
+    code = _render_plugin_template(name)
     return {"ok": True, "code": code}
 
 @app.post("/admin/dry_run")
 async def admin_dry_run(req: Request):
     """Прогнать пакет алертов через пайплайн без отправки в MM."""
     try:
-        payload = await req.json()
+        payload = await _read_json(req)
     except Exception:
-        return JSONResponse({"ok": False, "error": "invalid json"}, 400)
+        return DEFAULT_RESPONSE_CLASS({"ok": False, "error": "invalid json"}, 400)
 
     alerts = payload.get("alerts")
     if not isinstance(alerts, list):
         alerts = [payload] if isinstance(payload, dict) else []
 
-    text, color = fmt_batch_message(alerts)
+    text, color = await run_in_threadpool(fmt_batch_message, alerts)
     return {"ok": True, "preview": text, "color": color}
 
 
 @app.get("/admin/plugins/{name}/schema")
-async def admin_plugin_schema(name: str):
+def admin_plugin_schema(name: str):
     """
     Возвращает PARAMS_SCHEMA плагина, если он её объявляет.
     Ответ: { "schema": {...} } или { "schema": null }
+    Выполняет код плагина целиком (импорты, разбор файла) — поэтому обычный def,
+    FastAPI запускает его в пуле потоков, а не в event loop.
     """
     plugin_file = os.path.join(BASE_DIR, "plugins", f"{name}.py")
     if not os.path.isfile(plugin_file):
-        return JSONResponse({"error": f"Plugin not found: {name}"}, status_code=404)
+        return DEFAULT_RESPONSE_CLASS({"error": f"Plugin not found: {name}"}, status_code=404)
     try:
-        import importlib.util as _ilu
-        spec = _ilu.spec_from_file_location(f"_schema_{name}", plugin_file)
-        mod  = _ilu.module_from_spec(spec)
+        spec = importlib.util.spec_from_file_location(f"_schema_{name}", plugin_file)
+        mod  = importlib.util.module_from_spec(spec)
         spec.loader.exec_module(mod)
         schema = getattr(mod, "PARAMS_SCHEMA", None)
         return {"schema": schema}
     except Exception as e:
-        return JSONResponse({"error": str(e)}, status_code=500)
+        return DEFAULT_RESPONSE_CLASS({"error": str(e)}, status_code=500)
 
 
 @app.post("/admin/test_plugin")
@@ -759,40 +1270,40 @@ async def admin_test_plugin(req: Request):
     }
     """
     try:
-        body = await req.json()
+        body = await _read_json(req)
     except Exception:
-        return JSONResponse({"ok": False, "error": "invalid json"}, 400)
+        return DEFAULT_RESPONSE_CLASS({"ok": False, "error": "invalid json"}, 400)
 
     plugin_name = body.get("plugin", "").strip()
     if not plugin_name:
-        return JSONResponse({"ok": False, "error": "plugin name required"}, 400)
+        return DEFAULT_RESPONSE_CLASS({"ok": False, "error": "plugin name required"}, 400)
 
     alert = body.get("alert", {})
     params = body.get("params", {})
     send_to_mm = body.get("send_to_mm", False)
 
     if not PLUGINS_AVAILABLE or not plugin_router:
-        return JSONResponse({"ok": False, "error": "plugin system not available"}, 500)
+        return DEFAULT_RESPONSE_CLASS({"ok": False, "error": "plugin system not available"}, 500)
 
-    # Загружаем плагин напрямую (минуя маршрутизацию)
-    plugin_module = plugin_router.load_plugin(plugin_name)
+    # Загружаем плагин напрямую (минуя маршрутизацию). Первая загрузка
+    # выполняет файл плагина — делаем это в пуле потоков, как и сам run
+    plugin_module = await run_in_threadpool(plugin_router.load_plugin, plugin_name)
     if not plugin_module:
-        return JSONResponse({"ok": False, "error": f"plugin '{plugin_name}' not found or failed to load"}, 404)
+        return DEFAULT_RESPONSE_CLASS({"ok": False, "error": f"plugin '{plugin_name}' not found or failed to load"}, 404)
 
     try:
-        result = plugin_module.run(alert, prom if PROM_CLIENT_AVAILABLE else None, params)
+        # Плагин ходит в Prometheus синхронно — не держим event loop
+        result = await run_in_threadpool(plugin_module.run, alert, prom if PROM_CLIENT_AVAILABLE else None, params)
     except Exception as e:
-        import traceback
-        return JSONResponse({"ok": False, "error": str(e), "traceback": traceback.format_exc()}, 500)
+        return DEFAULT_RESPONSE_CLASS({"ok": False, "error": str(e), "traceback": traceback.format_exc()}, 500)
 
     if not isinstance(result, dict):
-        return JSONResponse({"ok": False, "error": "plugin returned invalid result (expected dict)"}, 500)
+        return DEFAULT_RESPONSE_CLASS({"ok": False, "error": "plugin returned invalid result (expected dict)"}, 500)
 
     # Если просят отправить в MM — собираем полный пайплайн
     mm_sent = False
     if send_to_mm:
-        text, color = fmt_batch_message([alert])
-        mm_sent = send_alert_message(text, color)
+        mm_sent, _ = await run_in_threadpool(deliver_alerts, [alert])
 
     return {
         "ok": True,
@@ -816,7 +1327,6 @@ def rabbit_consume_loop():
     creds = pika.PlainCredentials(RABBIT_USER, RABBIT_PASS)
     if RABBIT_SSL:
         # SSL connection
-        import pika.adapters.utils.connection_workflow
         ssl_options = pika.SSLOptions(context=None)
         params = pika.ConnectionParameters(
             host=RABBIT_HOST,
@@ -842,13 +1352,18 @@ def rabbit_consume_loop():
 
             def on_msg(ch, method, props, body):
                 try:
-                    j = json.loads(body.decode("utf-8"))
-                    if "alerts" in j and isinstance(j["alerts"], list):
-                        text, color = fmt_batch_message(j["alerts"])
+                    if not _delivery_enabled():
+                        print("[RABBIT] no delivery channel, message dropped")
+                        return
+                    j = _json_loads(body)
+                    # Один get вместо проверки ключа и повторного обращения по нему
+                    alerts = j.get("alerts") if isinstance(j, dict) else None
+                    if isinstance(alerts, list):
+                        if alerts:
+                            deliver_alerts(alerts)
                     else:
                         # обернём одиночный в пакет
-                        text, color = fmt_batch_message([j])
-                    send_alert_message(text, color)
+                        deliver_alerts([j])
                 except Exception as e:
                     print(f"[RABBIT] msg err: {e}")
                 finally:
@@ -882,4 +1397,4 @@ if __name__ == "__main__":
 
     # поднимаем uvicorn программно
     import uvicorn
-    uvicorn.run(app, host=LISTEN_HOST, port=LISTEN_PORT, log_level="info")
\ No newline at end of file
+    uvicorn.run(app, host=LISTEN_HOST, port=LISTEN_PORT, log_level="info", loop="auto", http="auto")
\ No newline at end of file
@@ -9,9 +9,11 @@ import os
 import sys
 import logging
 import signal
-import time
 from pathlib import Path
 
+import requests
+from dotenv import load_dotenv
+
 # Add current directory to path for imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
@@ -47,7 +49,6 @@ class AlertmanagerIntegration:
         # Load from seed.env if it exists
         env_file = Path("configs/seed.env")
         if env_file.exists():
-            from dotenv import load_dotenv
             load_dotenv(env_file)
         
         self.alertmanager_url = os.getenv('ALERTMANAGER_URL', 'https://alertmanager.sberdevices.ru')
@@ -167,7 +168,6 @@ class AlertmanagerIntegration:
         
         # Test SEED Agent
         try:
-            import requests
             response = requests.get(f"{self.seed_agent_url}/health", timeout=10)
             if response.status_code == 200:
                 logger.info("✅ SEED Agent connection OK")
@@ -4,13 +4,23 @@ cd "$(dirname "$0")"
 
 echo "== SEED v6 stop =="
 
+# Сколько ждать штатной остановки. На SIGTERM агент досылает алерты, которые
+# уже подтверждены Alertmanager'у (202): это запросы к Prometheus, LLM и
+# Mattermost, поэтому секунды не хватает. После таймаута — kill -9, и
+# недоставленное теряется
+STOP_TIMEOUT="${SEED_STOP_TIMEOUT:-60}"
+
 # Kill by process signature
 if pgrep -f "python3.*seed-agent.py" >/dev/null 2>&1; then
-  echo -n "Stopping seed-agent.py… "
+  echo -n "Stopping seed-agent.py (draining queue, up to ${STOP_TIMEOUT}s)… "
   pkill -f "python3.*seed-agent.py" || true
-  sleep 1
+  waited=0
+  while pgrep -f "python3.*seed-agent.py" >/dev/null 2>&1 && [ "$waited" -lt "$STOP_TIMEOUT" ]; do
+    sleep 1
+    waited=$((waited + 1))
+  done
   if pgrep -f "python3.*seed-agent.py" >/dev/null 2>&1; then
-    echo -n "force kill… "
+    echo -n "still running after ${STOP_TIMEOUT}s, force kill (queued alerts may be lost)… "
     pkill -9 -f "python3.*seed-agent.py" || true
   fi
   echo "OK"